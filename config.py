@@ -59,6 +59,16 @@ ROUTE_QUALITY_HOSTS = [
     ('http://connectivitycheck.android.com/generate_204', 'Android'),
 ]
 
+# ============================================================
+# DNS SETTINGS
+# ============================================================
+
+# Resolver timeout in seconds (used with aiodns)
+DNS_TIMEOUT = 2
+
+# How long resolved proxy hostnames are cached, in seconds
+DNS_CACHE_TTL = 600
+
 # ============================================================
 # IP REPUTATION SETTINGS
 # ============================================================
@@ -66,6 +76,17 @@ ROUTE_QUALITY_HOSTS = [
 IP_REPUTATION_TIMEOUT = 5
 BLACKLIST_CACHE_TIME = 3600  # Cache results for 1 hour
 
+# Query every DNSBL even after one has listed the IP (slower, but records
+# the full picture for each blacklisted address)
+VERBOSE_REPUTATION = False
+
+# Local blocklist snapshots (plain text, one IPv4 address per line).
+# When set, stage 3 looks IPs up in cache/blacklist.db instead of querying
+# DNSBLs. The snapshot is refreshed every BLACKLIST_CACHE_TIME seconds.
+BLOCKLIST_URLS = [
+    # 'https://example.com/blocklist.txt',
+]
+
 # ============================================================
 # PROXY SOURCES
 # ============================================================
@@ -95,7 +116,7 @@ MY_CHANNEL = '@vlesstrojan'  # Update with your channel name
 
 LOG_LEVEL = 'INFO'  # DEBUG, INFO, WARNING, ERROR, CRITICAL
 LOG_TO_FILE = True
-LOG_FILE = 'validator.log'
+# LOG_FILE is set below, next to the other paths anchored at WORKDIR
 
 # ============================================================
 # DIRECTORIES
@@ -105,8 +126,11 @@ WORKDIR = os.path.dirname(os.path.abspath(__file__))
 XRAY_FOLDER = os.path.join(WORKDIR, 'xray')
 RESULTS_FOLDER = os.path.join(WORKDIR, 'results')
 CACHE_FOLDER = os.path.join(WORKDIR, 'cache')
+LOG_FILE = os.path.join(WORKDIR, 'validator.log')
+
 
-# Create directories if they don't exist
-os.makedirs(XRAY_FOLDER, exist_ok=True)
-os.makedirs(RESULTS_FOLDER, exist_ok=True)
-os.makedirs(CACHE_FOLDER, exist_ok=True)
+def ensure_dirs():
+    """Create working directories if they don't exist."""
+    os.makedirs(XRAY_FOLDER, exist_ok=True)
+    os.makedirs(RESULTS_FOLDER, exist_ok=True)
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
@@ -14,15 +14,38 @@ Telegram: @vlesstrojan
 import os
 import sys
 import re
+import asyncio
 import json
+import logging
 import socket
 import time
 import base64
 import subprocess
 import hashlib
-from datetime import datetime
+import ipaddress
+import math
+import struct
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Sized
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from urllib.parse import unquote, urlparse
 import requests
+from requests.adapters import HTTPAdapter
+
+# orjson (C extension) is optional; results fall back to the stdlib encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# aiodns (c-ares) is optional; without it getaddrinfo runs in a thread pool
+try:
+    import aiodns
+except ImportError:
+    aiodns = None
 
 # Try to import custom configuration
 try:
@@ -31,7 +54,388 @@ except ImportError:
     print("Warning: config.py not found. Using default settings.")
     MAX_LATENCY = 2000
     TCP_TIMEOUT = 3
+    MAX_WORKERS = 25
     ENABLE_STAGE3_IP_REPUTATION = True
+    IP_REPUTATION_TIMEOUT = 5
+    BLACKLIST_CACHE_TIME = 3600
+    CACHE_FOLDER = 'cache'
+    DNS_TIMEOUT = 2
+    DNS_CACHE_TTL = 600
+    HTTP_TIMEOUT = 5
+    BLOCKLIST_URLS = []
+    VERBOSE_REPUTATION = False
+    LOG_LEVEL = 'INFO'
+    LOG_TO_FILE = False
+    LOG_FILE = 'validator.log'
+    
+    def ensure_dirs():
+        """No working directories to create without config.py."""
+
+
+# Protocol, host (name, IPv4 or bracketed IPv6) and port in a single pass.
+# Host names must use valid label syntax (1-63 chars, no empty labels).
+_URI_RE = re.compile(
+    r'^(vless|vmess|trojan|ss)://[^@]*@'
+    r'(\[[0-9a-f:.]+\]'
+    r'|(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)*'
+    r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?)'
+    r':(\d{1,5})(?=[/?#]|$)',
+    re.I)
+
+_SCHEME_MAP = {
+    'vless': 'VLESS',
+    'vmess': 'VMess',
+    'trojan': 'Trojan',
+    'ss': 'ShadowSocks',
+}
+
+_DNSBL_HOSTS = ('zen.spamhaus.org', 'bl.spamcop.net', 'dnsbl.sorbs.net')
+
+# getaddrinfo errors meaning "no such record", i.e. the IP is not listed;
+# any other resolver error says nothing about the IP and is not cached
+_NOT_LISTED_ERRNOS = frozenset(
+    (socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)))
+
+# Maximum number of hostnames kept in the resolver cache
+_DNS_CACHE_SIZE = 10000
+
+# Maximum number of (host, port) endpoints whose stage results are kept
+_ENDPOINT_CACHE_SIZE = 10000
+
+# How long (seconds) a finished endpoint check may be reused
+_ENDPOINT_CACHE_TTL = 300
+
+# Queue sentinel telling run_validation workers to stop
+_STOP = object()
+
+
+def _resolve_ipv4(name, flags=socket.AI_ADDRCONFIG):
+    """
+    Blocking IPv4 lookup through getaddrinfo.
+    
+    Used instead of gethostbyname. The default AI_ADDRCONFIG skips
+    lookups for address families the host has no address configured
+    for, which only makes sense for names we are going to connect to.
+    
+    Args:
+        name: Name to resolve
+        flags: getaddrinfo flags
+        
+    Raises:
+        socket.gaierror: If the name does not resolve
+    """
+    infos = socket.getaddrinfo(name, None, socket.AF_INET, socket.SOCK_STREAM,
+                               0, flags)
+    return infos[0][4][0]
+
+
+def _ndjson_line(obj):
+    """Serialize one object as a compact NDJSON line (bytes)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, separators=(',', ':')) + '\n').encode()
+
+
+def _json_bytes(obj):
+    """Serialize an object as indented JSON (bytes)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode()
+
+
+class DnsblCache:
+    """
+    Two-level cache of DNSBL lookups keyed by (ip, dnsbl).
+    
+    Hot entries are kept in an in-memory LRU; all entries are persisted
+    to SQLite so they survive across runs until they expire.
+    """
+    
+    def __init__(self, path, ttl, maxsize=4096):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path: SQLite database file
+            ttl: Entry lifetime in seconds
+            maxsize: Maximum number of entries held in memory
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS dnsbl ('
+            'ip TEXT, dnsbl TEXT, status INT, expires INT, '
+            'PRIMARY KEY(ip, dnsbl))'
+        )
+        # Rows are only replaced when the same IP is seen again, so
+        # purge expired ones to keep the file bounded by the ttl
+        self._db.execute(
+            'DELETE FROM dnsbl WHERE expires <= ?', (int(time.time()),))
+        self._db.commit()
+    
+    def get(self, ip, dnsbl):
+        """
+        Look up a cached result.
+        
+        Returns:
+            bool: True if listed, False if clean, None on miss or expiry
+        """
+        key = (ip, dnsbl)
+        now = int(time.time())
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                entry = self._db.execute(
+                    'SELECT status, expires FROM dnsbl WHERE ip=? AND dnsbl=?',
+                    key).fetchone()
+                if entry is None:
+                    return None
+                self._remember(key, entry)
+            else:
+                self._memory.move_to_end(key)
+            status, expires = entry
+            if expires <= now:
+                del self._memory[key]
+                return None
+            return bool(status)
+    
+    def set(self, ip, dnsbl, listed):
+        """Store a lookup result with expiry at now + ttl."""
+        key = (ip, dnsbl)
+        entry = (int(listed), int(time.time()) + self.ttl)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO dnsbl (ip, dnsbl, status, expires) '
+                'VALUES (?, ?, ?, ?)', key + entry)
+            self._db.commit()
+            self._remember(key, entry)
+    
+    def _remember(self, key, entry):
+        """Insert into the memory LRU, evicting the oldest entry if full."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+    
+    Answers "definitely not present" from memory; positives may be false
+    and must be confirmed elsewhere.
+    """
+    
+    _HEADER = struct.Struct('<QI')
+    
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        Size the filter for the expected number of items.
+        
+        Args:
+            capacity: Expected number of items
+            error_rate: Target false positive rate
+        """
+        capacity = max(capacity, 1)
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+    
+    def _positions(self, item):
+        """Bit positions for an item (double hashing over one digest)."""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+    
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+    
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7))
+                   for pos in self._positions(item))
+    
+    def save(self, path):
+        """Write the filter to disk atomically."""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self._HEADER.pack(self.num_bits, self.num_hashes))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path):
+        """
+        Read a filter written by save().
+        
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file is truncated or corrupt
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < cls._HEADER.size:
+            raise ValueError(f"Truncated Bloom filter: {path}")
+        bloom = cls.__new__(cls)
+        bloom.num_bits, bloom.num_hashes = cls._HEADER.unpack_from(data)
+        if bloom.num_bits == 0 or bloom.num_hashes == 0:
+            raise ValueError(f"Corrupt Bloom filter header: {path}")
+        bloom.bits = bytearray(data[cls._HEADER.size:])
+        if len(bloom.bits) != (bloom.num_bits + 7) // 8:
+            raise ValueError(f"Corrupt Bloom filter: {path}")
+        return bloom
+
+
+class LocalBlocklist:
+    """
+    Local snapshot of known-bad IPv4 addresses stored in SQLite.
+    
+    Replaces per-IP DNSBL queries with an indexed local lookup. The
+    snapshot is rebuilt from plain-text lists (one address per line).
+    A Bloom filter of the snapshot answers most lookups for clean IPs
+    from memory; only its positives are confirmed in SQLite.
+    """
+    
+    def __init__(self, path, bloom_path):
+        """
+        Open (or create) the blocklist database and its Bloom filter.
+        
+        Args:
+            path: SQLite database file
+            bloom_path: Bloom filter file kept in sync with the database
+        """
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS bl (ip TEXT)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS ip_idx ON bl(ip)')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INT)')
+        self._db.commit()
+        
+        self._bloom_path = bloom_path
+        # Until a snapshot has been stored the table says nothing about
+        # any IP, so callers must not treat a miss as clean
+        self.loaded = self.age() is not None
+        try:
+            self._bloom = BloomFilter.load(bloom_path)
+        except (OSError, ValueError):
+            # Missing or damaged: rebuild from the stored snapshot
+            rows = self._db.execute('SELECT ip FROM bl').fetchall()
+            self._bloom = self._build_bloom(ip for (ip,) in rows)
+    
+    def __contains__(self, ip):
+        if ip not in self._bloom:
+            return False
+        with self._lock:
+            row = self._db.execute(
+                'SELECT 1 FROM bl WHERE ip=? LIMIT 1', (ip,)).fetchone()
+        return row is not None
+    
+    def age(self):
+        """Seconds since the last refresh, or None if never refreshed."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key='updated'").fetchone()
+        return None if row is None else time.time() - row[0]
+    
+    def refresh(self, urls, http):
+        """
+        Download the given lists and replace the stored snapshot.
+        
+        The old snapshot is kept if any download fails.
+        
+        Args:
+            urls: Blocklist URLs
+            http: requests.Session used for the downloads
+            
+        Returns:
+            int: Number of addresses stored
+            
+        Raises:
+            requests.RequestException: If a list cannot be downloaded
+        """
+        addresses = set()
+        for url in urls:
+            response = http.get(url, timeout=HTTP_TIMEOUT)
+            response.raise_for_status()
+            addresses.update(self._parse(response.text))
+        
+        with self._lock:
+            with self._db:
+                self._db.execute('DELETE FROM bl')
+                self._db.executemany(
+                    'INSERT INTO bl (ip) VALUES (?)',
+                    ((ip,) for ip in addresses))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) "
+                    "VALUES ('updated', ?)", (int(time.time()),))
+            self._bloom = self._build_bloom(addresses)
+            self.loaded = True
+        return len(addresses)
+    
+    def _build_bloom(self, addresses):
+        """Build a Bloom filter over the addresses and persist it."""
+        addresses = list(addresses)
+        bloom = BloomFilter(len(addresses))
+        for ip in addresses:
+            bloom.add(ip)
+        bloom.save(self._bloom_path)
+        return bloom
+    
+    @staticmethod
+    def _parse(text):
+        """Yield IPv4 addresses from a list, skipping comments and networks."""
+        for line in text.splitlines():
+            entry = line.split('#', 1)[0].split(';', 1)[0].strip()
+            if not entry:
+                continue
+            entry = entry.split()[0]
+            if entry.endswith('/32'):
+                entry = entry[:-3]
+            try:
+                yield str(ipaddress.IPv4Address(entry))
+            except ValueError:
+                continue
+
+
+class _CachedTimeFormatter(logging.Formatter):
+    """Formatter that renders the timestamp once per second, not per record."""
+    
+    def __init__(self, fmt, datefmt):
+        super().__init__(fmt, datefmt)
+        self._last_ts = (None, '')
+    
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        cached_second, text = self._last_ts
+        if second != cached_second:
+            text = time.strftime(datefmt or self.datefmt, self.converter(second))
+            # Single tuple assignment keeps concurrent handlers consistent
+            self._last_ts = (second, text)
+        return text
+
+
+def _get_logger():
+    """Return the validator logger, configuring its handlers once."""
+    logger = logging.getLogger('xray.validator')
+    if not logger.handlers:
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+        formatter = _CachedTimeFormatter('[%(asctime)s] %(message)s',
+                                         '%Y-%m-%d %H:%M:%S')
+        handlers = [logging.StreamHandler(sys.stdout)]
+        if LOG_TO_FILE:
+            handlers.append(logging.FileHandler(LOG_FILE))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+    return logger
 
 
 class ProxyValidator:
@@ -45,13 +449,43 @@ class ProxyValidator:
             'xray_live': 0,
             'speed_tested': 0,
             'stable': 0,
+            'valid': 0,
+            'errors': 0,
         }
         self.results = []
+        self._log = _get_logger()
+        # Shared HTTP session so connections (and TLS sessions) are reused
+        self.http = requests.Session()
+        self.http.headers['User-Agent'] = (
+            'xray-proxy-validator (+https://github.com/kort0881/xray-proxy-validator)')
+        adapter = HTTPAdapter(pool_connections=MAX_WORKERS,
+                              pool_maxsize=MAX_WORKERS * 4, max_retries=0)
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+        self._results_dir = globals().get('RESULTS_FOLDER', '.')
+        os.makedirs(self._results_dir, exist_ok=True)
+        # NDJSON output file while run_validation streams results
+        self._out = None
+        # (host, port) -> (stage results, expires), or the task still
+        # computing them
+        self._endpoint_cache = OrderedDict()
+        self._dnsbl_cache = None
+        if ENABLE_STAGE3_IP_REPUTATION:
+            self._dnsbl_cache = DnsblCache(
+                os.path.join(CACHE_FOLDER, 'dnsbl.sqlite'),
+                BLACKLIST_CACHE_TIME)
+        self._blocklist = None
+        if ENABLE_STAGE3_IP_REPUTATION and BLOCKLIST_URLS:
+            self._blocklist = LocalBlocklist(
+                os.path.join(CACHE_FOLDER, 'blacklist.db'),
+                os.path.join(CACHE_FOLDER, 'bad_ips.bloom'))
+        # hostname -> (ip, expires) for resolved proxy hosts
+        self._dns_cache = OrderedDict()
+        self._resolver = None
     
-    def log(self, msg):
-        """Print log message with timestamp."""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{timestamp}] {msg}")
+    def log(self, msg, *args):
+        """Log an INFO message (kept for backward compatibility)."""
+        self._log.info(msg, *args)
     
     def stage1_tcp_check(self, host, port):
         """
@@ -68,14 +502,88 @@ class ProxyValidator:
             bool: True if TCP connection successful
         """
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(TCP_TIMEOUT)
-            sock.connect((host, port))
-            sock.close()
-            return True
-        except (socket.timeout, socket.error, OSError):
+            # create_connection picks the address family via getaddrinfo,
+            # so IPv6-only hosts work too
+            with socket.create_connection((host, port), timeout=TCP_TIMEOUT):
+                return True
+        except OSError:
             return False
     
+    async def _tcp_async(self, host, port):
+        """
+        Non-blocking variant of stage 1 used by the concurrent pipeline.
+        
+        Args:
+            host: Proxy hostname or IP
+            port: Proxy port number
+            
+        Returns:
+            str: IP address actually connected to (or host itself if the
+                peer address is unavailable), None on failure
+        """
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), TCP_TIMEOUT)
+        except (asyncio.TimeoutError, OSError, UnicodeError, ValueError):
+            return None
+        # peername is None when getpeername() failed, e.g. on an
+        # immediate reset; the connect itself still succeeded
+        peer = writer.get_extra_info('peername')
+        peer_ip = peer[0] if peer else host
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return peer_ip
+    
+    def _get_resolver(self):
+        """Return the shared aiodns resolver bound to the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._resolver is None or self._resolver.loop is not loop:
+            self._resolver = aiodns.DNSResolver(
+                loop=loop, timeout=DNS_TIMEOUT, tries=1)
+        return self._resolver
+    
+    async def _resolve_async(self, host):
+        """
+        Resolve a hostname to an IPv4 address without blocking the loop.
+        
+        Answers are cached for DNS_CACHE_TTL seconds. Uses aiodns when
+        installed, otherwise getaddrinfo in the default executor.
+        
+        Args:
+            host: Hostname to resolve
+            
+        Returns:
+            str: First IPv4 address returned by the resolver
+            
+        Raises:
+            OSError: If the name cannot be resolved
+        """
+        now = time.monotonic()
+        cached = self._dns_cache.get(host)
+        if cached is not None and cached[1] > now:
+            self._dns_cache.move_to_end(host)
+            return cached[0]
+        
+        if aiodns is not None:
+            try:
+                answer = await self._get_resolver().gethostbyname(
+                    host, socket.AF_INET)
+            except aiodns.error.DNSError as e:
+                raise socket.gaierror(*e.args) from e
+            ip = answer.addresses[0]
+        else:
+            loop = asyncio.get_running_loop()
+            ip = await loop.run_in_executor(None, _resolve_ipv4, host)
+        
+        self._dns_cache[host] = (ip, now + DNS_CACHE_TTL)
+        self._dns_cache.move_to_end(host)
+        if len(self._dns_cache) > _DNS_CACHE_SIZE:
+            self._dns_cache.popitem(last=False)
+        return ip
+    
     def stage2_xray_test(self, proxy_config):
         """
         Stage 2: XRay Protocol Validation
@@ -102,6 +610,14 @@ class ProxyValidator:
         - SpamCop (bl.spamcop.net)
         - SORBS (dnsbl.sorbs.net)
         
+        When BLOCKLIST_URLS is configured and a snapshot has been stored,
+        the local blocklist is consulted instead and no DNS queries are
+        made.
+        
+        Results are cached per (ip, dnsbl) for BLACKLIST_CACHE_TIME seconds.
+        Uncached DNSBLs are queried in parallel. Unless VERBOSE_REPUTATION
+        is set, checking stops at the first DNSBL that lists the IP.
+        
         Args:
             ip_address: IP address to check
             
@@ -112,27 +628,145 @@ class ProxyValidator:
             return {'blacklisted': False}
         
         reputation = {'blacklisted': False, 'checks': {}}
+        if self._blocklist is not None and self._blocklist.loaded:
+            self._record_dnsbl(reputation, 'local', ip_address in self._blocklist)
+            return reputation
+        
+        reversed_ip = self._reverse_ip(ip_address)
+        pending = self._cached_reputation(ip_address, reputation)
+        
+        if pending:
+            executor = ThreadPoolExecutor(max_workers=len(pending))
+            futures = {
+                # DNSBL answers are listing markers, never connected to,
+                # so AI_ADDRCONFIG must not suppress the lookup
+                executor.submit(_resolve_ipv4, f"{reversed_ip}.{dnsbl}", 0): dnsbl
+                for dnsbl in pending
+            }
+            try:
+                for future in as_completed(futures, timeout=IP_REPUTATION_TIMEOUT):
+                    dnsbl = futures[future]
+                    try:
+                        future.result()
+                        listed = True
+                    except socket.gaierror as e:
+                        if e.errno not in _NOT_LISTED_ERRNOS:
+                            reputation['checks'][dnsbl] = 'ERROR'
+                            continue
+                        listed = False
+                    self._dnsbl_cache.set(ip_address, dnsbl, listed)
+                    self._record_dnsbl(reputation, dnsbl, listed)
+                    if listed and not VERBOSE_REPUTATION:
+                        break
+            except FuturesTimeoutError:
+                for future, dnsbl in futures.items():
+                    if not future.done():
+                        reputation['checks'][dnsbl] = 'TIMEOUT'
+            finally:
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=False)
+        
+        return reputation
+    
+    async def _stage3_async(self, ip_address):
+        """
+        Stage 3 for the concurrent pipeline.
+        
+        With aiodns installed all uncached DNSBL queries are issued on the
+        event loop at once; otherwise stage3_ip_reputation runs in the
+        default executor.
         
-        dnsbl_hosts = [
-            'zen.spamhaus.org',
-            'bl.spamcop.net',
-            'dnsbl.sorbs.net'
-        ]
+        Args:
+            ip_address: IP address to check
+            
+        Returns:
+            dict: Reputation status and details
+        """
+        if self._blocklist is not None and self._blocklist.loaded:
+            return self.stage3_ip_reputation(ip_address)
+        
+        if aiodns is None or not ENABLE_STAGE3_IP_REPUTATION:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, self.stage3_ip_reputation, ip_address)
         
-        # Reverse IP for DNSBL query
-        reversed_ip = '.'.join(reversed(ip_address.split('.')))
+        reputation = {'blacklisted': False, 'checks': {}}
+        reversed_ip = self._reverse_ip(ip_address)
+        pending = self._cached_reputation(ip_address, reputation)
+        if not pending:
+            return reputation
+        
+        resolver = self._get_resolver()
+        not_listed = (aiodns.error.ARES_ENOTFOUND, aiodns.error.ARES_ENODATA)
         
-        for dnsbl in dnsbl_hosts:
+        async def query(dnsbl):
             try:
-                query = f"{reversed_ip}.{dnsbl}"
-                socket.gethostbyname(query)
-                reputation['blacklisted'] = True
-                reputation['checks'][dnsbl] = 'LISTED'
-            except socket.gaierror:
-                reputation['checks'][dnsbl] = 'OK'
+                await resolver.query(f"{reversed_ip}.{dnsbl}", 'A')
+                return dnsbl, True
+            except aiodns.error.DNSError as e:
+                # None marks a resolver failure rather than an answer
+                return dnsbl, (False if e.args[0] in not_listed else None)
+        
+        tasks = [asyncio.ensure_future(query(dnsbl)) for dnsbl in pending]
+        try:
+            for next_answer in asyncio.as_completed(
+                    tasks, timeout=IP_REPUTATION_TIMEOUT):
+                dnsbl, listed = await next_answer
+                if listed is None:
+                    reputation['checks'][dnsbl] = 'ERROR'
+                    continue
+                self._dnsbl_cache.set(ip_address, dnsbl, listed)
+                self._record_dnsbl(reputation, dnsbl, listed)
+                if listed and not VERBOSE_REPUTATION:
+                    break
+        except asyncio.TimeoutError:
+            for dnsbl, task in zip(pending, tasks):
+                if not task.done():
+                    reputation['checks'][dnsbl] = 'TIMEOUT'
+        finally:
+            for task in tasks:
+                task.cancel()
         
         return reputation
     
+    def _reverse_ip(self, ip_address):
+        """Reverse IPv4 octets for a DNSBL query."""
+        return '.'.join(reversed(ip_address.split('.')))
+    
+    def _cached_reputation(self, ip_address, reputation):
+        """
+        Fill a reputation dict from the DNSBL cache.
+        
+        A cached listing ends the check early unless VERBOSE_REPUTATION
+        is set, in which case every DNSBL is still reported.
+        
+        Args:
+            ip_address: IP address being checked
+            reputation: Stage 3 result dict to update
+            
+        Returns:
+            list: DNSBL hosts that still need to be queried
+        """
+        pending = []
+        for dnsbl in _DNSBL_HOSTS:
+            listed = self._dnsbl_cache.get(ip_address, dnsbl)
+            if listed is None:
+                pending.append(dnsbl)
+            else:
+                self._record_dnsbl(reputation, dnsbl, listed)
+                if listed and not VERBOSE_REPUTATION:
+                    return []
+        return pending
+    
+    def _record_dnsbl(self, reputation, dnsbl, listed):
+        """Record a single DNSBL answer in a stage 3 reputation dict."""
+        if listed:
+            reputation['blacklisted'] = True
+            reputation['checks'][dnsbl] = 'LISTED'
+        else:
+            reputation['checks'][dnsbl] = 'OK'
+    
     def stage4_speed_test(self, proxy_config):
         """
         Stage 4: Speed Testing
@@ -209,43 +843,165 @@ class ProxyValidator:
         """
         Main validation method - runs all stages.
         
+        Synchronous wrapper around avalidate_proxy. It starts its own event
+        loop, so it cannot be called from code that is already running in
+        one; await avalidate_proxy there instead.
+        
         Args:
             proxy_uri: Proxy URI string (vless://, vmess://, trojan://, ss://)
             
+        Returns:
+            dict: Complete validation results
+        """
+        return asyncio.run(self.avalidate_proxy(proxy_uri))
+    
+    async def avalidate_proxy(self, proxy_uri):
+        """
+        Validation pipeline shared by validate_proxy and run_validation.
+        
+        Network waits are awaited so that many proxies can be checked
+        concurrently; blocking DNSBL lookups run in the default executor.
+        
+        Args:
+            proxy_uri: Proxy URI string
+            
         Returns:
             dict: Complete validation results
         """
         self.stats['total'] += 1
         
+        # One regex match rejects unknown protocols and malformed
+        # host:port pairs before any network stage runs
+        m = _URI_RE.match(proxy_uri)
         result = {
             'uri': proxy_uri,
-            'protocol': self.detect_protocol(proxy_uri),
+            'protocol': (_SCHEME_MAP[m.group(1).lower()] if m
+                         else self.detect_protocol(proxy_uri)),
             'valid': False,
             'stages': {}
         }
+        if not m:
+            return result
         
-        # Extract host and port
-        host, port = self.extract_host_port(proxy_uri)
-        if not host or not port:
+        host = m.group(2).strip('[]')
+        port = int(m.group(3))
+        if not 0 < port < 65536:
             return result
         
-        # Stage 1: TCP
-        if self.stage1_tcp_check(host, port):
+        stages = await self._endpoint_stages(host, port)
+        result['stages'] = dict(stages)
+        
+        if stages.get('tcp'):
             self.stats['tcp_live'] += 1
-            result['stages']['tcp'] = True
             result['host'] = host
             result['port'] = port
+            result['valid'] = True
+        
+        return result
+    
+    async def _endpoint_stages(self, host, port):
+        """
+        Return network stage results for an endpoint, checking it only once.
+        
+        Proxy lists from different sources often point at the same
+        endpoint with different credentials. Concurrent duplicates await
+        the same in-flight check; later ones reuse the stored result for
+        _ENDPOINT_CACHE_TTL seconds.
+        
+        Args:
+            host: Proxy hostname or IP
+            port: Proxy port number
             
-            # Stage 3: IP Reputation
+        Returns:
+            dict: Stage results, empty if the TCP check failed
+        """
+        endpoint = (host, port)
+        cached = self._endpoint_cache.get(endpoint)
+        if isinstance(cached, tuple):
+            stages, expires = cached
+            if expires > time.monotonic():
+                self._endpoint_cache.move_to_end(endpoint)
+                return stages
+            cached = None
+        
+        # A task left over from an earlier event loop can never complete
+        if cached is not None and cached.get_loop() is not asyncio.get_running_loop():
+            cached = None
+        
+        if cached is None:
+            cached = asyncio.ensure_future(self._check_endpoint(host, port))
+            cached.add_done_callback(
+                lambda task: self._settle_endpoint(endpoint, task))
+            self._endpoint_cache[endpoint] = cached
+            if len(self._endpoint_cache) > _ENDPOINT_CACHE_SIZE:
+                self._endpoint_cache.popitem(last=False)
+        
+        # Shielded so cancelling one caller does not cancel the check that
+        # other duplicates are waiting on
+        return await asyncio.shield(cached)
+    
+    def _settle_endpoint(self, endpoint, task):
+        """
+        Replace a finished endpoint check with its result, valid for
+        _ENDPOINT_CACHE_TTL seconds.
+        
+        Failed or cancelled checks are evicted instead, so they are retried
+        rather than re-raised, and no task outlives its event loop here.
+        """
+        if self._endpoint_cache.get(endpoint) is not task:
+            return
+        if task.cancelled() or task.exception() is not None:
+            del self._endpoint_cache[endpoint]
+        else:
+            self._endpoint_cache[endpoint] = (
+                task.result(), time.monotonic() + _ENDPOINT_CACHE_TTL)
+    
+    async def _check_endpoint(self, host, port):
+        """
+        Run the network stages (TCP, then IP reputation) for one endpoint.
+        
+        Args:
+            host: Proxy hostname or IP
+            port: Proxy port number
+            
+        Returns:
+            dict: Stage results, empty if the TCP check failed
+        """
+        stages = {}
+        
+        # Resolve once through the cached resolver and connect to that IP,
+        # so stage 3 checks the address stage 1 actually reached. IP
+        # literals need no DNS round-trip; hosts without an A record are
+        # left to open_connection (e.g. IPv6-only names).
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
             try:
-                ip = socket.gethostbyname(host)
-                result['stages']['ip_reputation'] = self.stage3_ip_reputation(ip)
-            except:
-                pass
+                address = ipaddress.ip_address(await self._resolve_async(host))
+            except (OSError, UnicodeError, ValueError):
+                address = None
+        
+        # Stage 1: TCP
+        peer_ip = await self._tcp_async(
+            str(address) if address is not None else host, port)
+        if peer_ip is None:
+            return stages
+        stages['tcp'] = True
+        
+        # Stage 3: IP Reputation
+        try:
+            if address is None:
+                address = ipaddress.ip_address(peer_ip)
             
-            result['valid'] = True
+            # The DNSBLs used here only cover public IPv4 space
+            if address.version != 4 or not address.is_global:
+                stages['ip_reputation'] = {'blacklisted': False, 'skipped': True}
+            else:
+                stages['ip_reputation'] = await self._stage3_async(str(address))
+        except (OSError, UnicodeError, ValueError):
+            pass
         
-        return result
+        return stages
     
     def detect_protocol(self, uri):
         """
@@ -257,15 +1013,12 @@ class ProxyValidator:
         Returns:
             str: Protocol name (VLESS, VMess, Trojan, SS)
         """
-        if uri.lower().startswith('vless://'):
-            return 'VLESS'
-        elif uri.lower().startswith('vmess://'):
-            return 'VMess'
-        elif uri.lower().startswith('trojan://'):
-            return 'Trojan'
-        elif uri.lower().startswith('ss://'):
-            return 'ShadowSocks'
-        return 'Unknown'
+        # Only the first 9 characters can hold a known scheme ("trojan://"),
+        # so long base64 URIs are never copied or lower-cased in full
+        scheme, sep, _ = uri[:9].lower().partition('://')
+        if not sep:
+            return 'Unknown'
+        return _SCHEME_MAP.get(scheme, 'Unknown')
     
     def extract_host_port(self, uri):
         """
@@ -277,50 +1030,146 @@ class ProxyValidator:
         Returns:
             tuple: (host, port) or (None, None) if parsing fails
         """
-        try:
-            # Simple parsing - real implementation would be more complex
-            if '@' in uri:
-                host_port = uri.split('@')[1].split('?')[0]
-                if ':' in host_port:
-                    parts = host_port.rsplit(':', 1)
-                    return parts[0], int(parts[1])
-        except:
-            pass
+        m = _URI_RE.match(uri)
+        if m:
+            port = int(m.group(3))
+            if 0 < port < 65536:
+                return m.group(2).strip('[]'), port
         return None, None
     
-    def run_validation(self, proxies):
+    def run_validation(self, proxies, filename=None):
         """
-        Run validation on a list of proxies.
+        Run validation on an iterable of proxies.
+        
+        Up to MAX_WORKERS proxies are validated concurrently. The iterable
+        is consumed lazily, so generators over large sources never need
+        to be materialized in memory.
         
         Args:
-            proxies: List of proxy URI strings
+            proxies: Iterable of proxy URI strings
+            filename: If given, valid results are written to this file in
+                the results folder as NDJSON while validation runs, instead
+                of being collected in self.results
         """
-        self.log(f"Starting validation of {len(proxies)} proxies...")
+        if isinstance(proxies, Sized):
+            self._log.info("Starting validation of %d proxies...", len(proxies))
+        else:
+            self._log.info("Starting validation...")
         
-        for proxy in proxies:
-            result = self.validate_proxy(proxy)
-            if result['valid']:
-                self.results.append(result)
+        # Endpoint results must not outlive one validation pass
+        self._endpoint_cache.clear()
+        self.update_blocklist()
+        if filename is None:
+            asyncio.run(self._run_async(proxies))
+        else:
+            output_path = self._results_path(filename)
+            with open(output_path, 'wb') as self._out:
+                try:
+                    asyncio.run(self._run_async(proxies))
+                finally:
+                    self._out = None
+            self._log.info("Results saved to %s", output_path)
         
-        self.log(f"Validation complete. Valid proxies: {len(self.results)}")
+        self._log.info("Validation complete. Valid proxies: %d",
+                       self.stats['valid'])
         self.print_stats()
     
+    def update_blocklist(self, force=False):
+        """
+        Refresh the local blocklist snapshot once it is older than
+        BLACKLIST_CACHE_TIME.
+        
+        Args:
+            force: Refresh even if the snapshot is still fresh
+        """
+        if self._blocklist is None:
+            return
+        
+        age = self._blocklist.age()
+        if not force and age is not None and age < BLACKLIST_CACHE_TIME:
+            return
+        
+        try:
+            count = self._blocklist.refresh(BLOCKLIST_URLS, self.http)
+            self._log.info("Blocklist updated: %d addresses", count)
+        except requests.RequestException as e:
+            if self._blocklist.loaded:
+                self._log.warning(
+                    "Blocklist update failed, keeping old snapshot: %s", e)
+            else:
+                self._log.warning(
+                    "Blocklist update failed and no snapshot exists, "
+                    "using DNSBL queries: %s", e)
+    
+    async def _run_async(self, proxies):
+        """
+        Feed proxies through a bounded queue to MAX_WORKERS workers.
+        
+        At most MAX_WORKERS * 4 proxies are buffered ahead of the workers.
+        Blocking work handed to the executor (threaded DNSBL lookups,
+        getaddrinfo) gets a pool of MAX_WORKERS threads so it can keep up
+        with the number of in-flight proxies. Stats are only updated from
+        the event loop thread, so they need no locking.
+        """
+        # asyncio.run() shuts the default executor down on exit
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=MAX_WORKERS))
+        
+        queue = asyncio.Queue(maxsize=MAX_WORKERS * 4)
+        
+        async def produce():
+            for proxy in proxies:
+                await queue.put(proxy)
+            for _ in range(MAX_WORKERS):
+                await queue.put(_STOP)
+        
+        await asyncio.gather(
+            produce(), *[self._worker(queue) for _ in range(MAX_WORKERS)])
+    
+    async def _worker(self, queue):
+        """Validate proxies from the queue until the stop sentinel arrives."""
+        while True:
+            proxy = await queue.get()
+            if proxy is _STOP:
+                return
+            # One bad proxy must not take down the other workers
+            try:
+                result = await self.avalidate_proxy(proxy)
+            except Exception:
+                self.stats['errors'] += 1
+                self._log.exception("Validation failed for %r", proxy)
+                continue
+            if result['valid']:
+                self.stats['valid'] += 1
+                if self._out is not None:
+                    # Flush per line so a crash loses at most one result
+                    self._out.write(_ndjson_line(result))
+                    self._out.flush()
+                else:
+                    self.results.append(result)
+    
     def print_stats(self):
         """Print validation statistics."""
-        self.log("="*50)
-        self.log("VALIDATION STATISTICS")
-        self.log("="*50)
-        self.log(f"Total proxies tested: {self.stats['total']}")
-        self.log(f"TCP connectivity: {self.stats['tcp_live']}")
-        self.log(f"Valid proxies: {len(self.results)}")
-        self.log("="*50)
+        self._log.info("=" * 50)
+        self._log.info("VALIDATION STATISTICS")
+        self._log.info("=" * 50)
+        self._log.info("Total proxies tested: %d", self.stats['total'])
+        self._log.info("TCP connectivity: %d", self.stats['tcp_live'])
+        self._log.info("Valid proxies: %d", self.stats['valid'])
+        if self.stats['errors']:
+            self._log.info("Validation errors: %d", self.stats['errors'])
+        self._log.info("=" * 50)
+    
+    def _results_path(self, filename):
+        """Return the path of a file in the results folder."""
+        return os.path.join(self._results_dir, filename)
     
     def save_results(self, filename='results.json'):
-        """Save validation results to JSON file."""
-        output_path = os.path.join(RESULTS_FOLDER if 'RESULTS_FOLDER' in globals() else '.', filename)
-        with open(output_path, 'w') as f:
-            json.dump(self.results, f, indent=2)
-        self.log(f"Results saved to {output_path}")
+        """Save validation results collected in memory to JSON file."""
+        output_path = self._results_path(filename)
+        with open(output_path, 'wb') as f:
+            f.write(_json_bytes(self.results))
+        self._log.info("Results saved to %s", output_path)
 
 
 def main():
@@ -334,6 +1183,7 @@ def main():
     ╚═════════════════════════════════════════╝
     """)
     
+    ensure_dirs()
     validator = ProxyValidator()
     
     # Example usage - replace with your proxy list
@@ -342,10 +1192,7 @@ def main():
         'trojan://password@proxy.example.com:443?security=tls&sni=example.com#Example2',
     ]
     
-    validator.run_validation(example_proxies)
-    
-    if validator.results:
-        validator.save_results()
+    validator.run_validation(example_proxies, filename='results.ndjson')
 
 
 if __name__ == '__main__':